@@ -8,75 +8,426 @@ Author: Felix Gabriel Girola
 """
 
 import os
-import json
+import time
+import uuid
+from collections import OrderedDict
 from http.server import BaseHTTPRequestHandler
-from urllib.parse import urlparse, parse_qs
-from datetime import datetime
-import requests
+from urllib.parse import unquote_plus
+from datetime import datetime, timedelta
+import httpx
 
 from google.oauth2.credentials import Credentials
-from google_auth_oauthlib.flow import Flow
-from google.auth.transport.requests import Request as GoogleRequest
+
+# orjson is much faster and emits bytes directly; fall back to the
+# stdlib codec if the wheel isn't available on the build image
+try:
+    import orjson
+
+    def json_dumps(data):
+        return orjson.dumps(data)
+
+    json_loads = orjson.loads
+except ImportError:
+    import json
+
+    def json_dumps(data):
+        return json.dumps(data).encode()
+
+    json_loads = json.loads
+
+# Pre-encoded bodies for the most frequent fixed responses
+_NOT_FOUND_JSON = b'{"error":"Not found"}'
+_AUTH_TRUE = b'{"authenticated":true}'
+_AUTH_FALSE = b'{"authenticated":false}'
 
 # Configuration from environment
 GOOGLE_CLIENT_ID = os.environ.get('GOOGLE_CLIENT_ID')
 GOOGLE_CLIENT_SECRET = os.environ.get('GOOGLE_CLIENT_SECRET')
 FRONTEND_URL = os.environ.get('FRONTEND_URL', 'https://dataroom-acme.vercel.app')
 REDIRECT_URI = os.environ.get('GOOGLE_REDIRECT_URI', f'{FRONTEND_URL}/api/auth/callback')
+KV_URL = os.environ.get('KV_URL')
 
 SCOPES = [
     'https://www.googleapis.com/auth/drive.readonly',
     'https://www.googleapis.com/auth/drive.metadata.readonly'
 ]
 
-# In-memory storage (for demo - use Vercel KV or database in production)
-token_storage = {}
-files_storage = {}
+# OAuth client config is constant per deployment, so build it once
+_CLIENT_CONFIG = {
+    "web": {
+        "client_id": GOOGLE_CLIENT_ID,
+        "client_secret": GOOGLE_CLIENT_SECRET,
+        "auth_uri": "https://accounts.google.com/o/oauth2/auth",
+        "token_uri": "https://oauth2.googleapis.com/token",
+        "redirect_uris": [REDIRECT_URI]
+    }
+}
+
+# Shared HTTP/2 client so warm invocations reuse (and multiplex over) one
+# TLS connection to googleapis.com instead of handshaking on every call
+_TIMEOUT = httpx.Timeout(10.0, connect=3.05)
+# (connection-level retries only; httpx has no status-code retry policy)
+_client = httpx.Client(
+    timeout=_TIMEOUT,
+    transport=httpx.HTTPTransport(
+        http2=True,
+        retries=2,
+        limits=httpx.Limits(max_keepalive_connections=20)
+    )
+)
+
+
+class MemoryStore:
+    """
+    Process-local storage, used when no Vercel KV database is configured.
+    
+    Every cold container starts empty, so this is only suitable for
+    local development and demos.
+    """
+    
+    def __init__(self):
+        self.token = None
+        self.files = {}  # google_drive_id -> record
+        # Secondary index on the numeric file id for O(1) view/delete lookups
+        self.files_by_numeric_id = {}
+        # Pre-lowercased names for local search, keyed by numeric file id
+        self.name_lower_index = {}
+        self.next_id = 1
+    
+    def get_token(self):
+        return self.token
+    
+    def set_token(self, token_data):
+        self.token = token_data
+    
+    def has_file(self, google_drive_id):
+        return google_drive_id in self.files
+    
+    def get_file(self, numeric_id):
+        return self.files_by_numeric_id.get(numeric_id)
+    
+    def add_file(self, record):
+        """Assign an id and store the record; returns None if already imported"""
+        if record['google_drive_id'] in self.files:
+            return None
+        record = {'id': self.next_id, **record}
+        self.next_id += 1
+        self.files[record['google_drive_id']] = record
+        self.files_by_numeric_id[record['id']] = record
+        self.name_lower_index[record['id']] = ((record['name'] or '').lower(), record)
+        return record
+    
+    def delete_file(self, numeric_id):
+        f = self.files_by_numeric_id.pop(numeric_id, None)
+        if f is None:
+            return False
+        self.files.pop(f['google_drive_id'], None)
+        self.name_lower_index.pop(numeric_id, None)
+        return True
+    
+    def list_files(self):
+        return list(self.files.values())
+    
+    def search_files(self, needle):
+        return [f for name, f in self.name_lower_index.values() if needle in name]
+    
+    def clear(self):
+        self.token = None
+        self.files.clear()
+        self.files_by_numeric_id.clear()
+        self.name_lower_index.clear()
+
+
+class KVStore:
+    """
+    Vercel KV (Redis) storage shared by every function instance.
+    
+    Layout:
+        token          JSON-encoded OAuth token data
+        files          hash of google_drive_id -> JSON file record
+        files:by_id    hash of numeric id -> google_drive_id
+        files:next_id  counter used to assign numeric ids
+    """
+    
+    def __init__(self, url):
+        # Imported lazily so local runs without KV don't need redis installed
+        import redis
+        self._kv = redis.Redis.from_url(url, decode_responses=True)
+    
+    def get_token(self):
+        raw = self._kv.get('token')
+        return json_loads(raw) if raw else None
+    
+    def set_token(self, token_data):
+        self._kv.set('token', json_dumps(token_data))
+    
+    def has_file(self, google_drive_id):
+        return bool(self._kv.hexists('files', google_drive_id))
+    
+    def get_file(self, numeric_id):
+        google_drive_id = self._kv.hget('files:by_id', numeric_id)
+        if not google_drive_id:
+            return None
+        raw = self._kv.hget('files', google_drive_id)
+        return json_loads(raw) if raw else None
+    
+    def add_file(self, record):
+        """Assign an id and store the record; returns None if already imported"""
+        record = {'id': self._kv.incr('files:next_id'), **record}
+        # HSETNX makes concurrent imports of the same Drive file race-safe
+        if not self._kv.hsetnx('files', record['google_drive_id'], json_dumps(record)):
+            return None
+        self._kv.hset('files:by_id', record['id'], record['google_drive_id'])
+        return record
+    
+    def delete_file(self, numeric_id):
+        google_drive_id = self._kv.hget('files:by_id', numeric_id)
+        if not google_drive_id:
+            return False
+        pipe = self._kv.pipeline()
+        pipe.hdel('files', google_drive_id)
+        pipe.hdel('files:by_id', numeric_id)
+        pipe.execute()
+        return True
+    
+    def list_files(self):
+        return [json_loads(raw) for raw in self._kv.hvals('files')]
+    
+    def search_files(self, needle):
+        return [f for f in self.list_files() if needle in (f.get('name') or '').lower()]
+    
+    def clear(self):
+        self._kv.delete('token', 'files', 'files:by_id')
+
+
+# Use Vercel KV when it's linked to the project, so any container can serve
+# any request without re-authenticating; otherwise keep state in-process
+store = KVStore(KV_URL) if KV_URL else MemoryStore()
 
 
 def create_oauth_flow():
     """Create OAuth flow for Google Drive"""
-    client_config = {
-        "web": {
-            "client_id": GOOGLE_CLIENT_ID,
-            "client_secret": GOOGLE_CLIENT_SECRET,
-            "auth_uri": "https://accounts.google.com/o/oauth2/auth",
-            "token_uri": "https://oauth2.googleapis.com/token",
-            "redirect_uris": [REDIRECT_URI]
-        }
-    }
-    flow = Flow.from_client_config(client_config, scopes=SCOPES)
+    # Imported lazily - only the login/callback endpoints need oauthlib
+    from google_auth_oauthlib.flow import Flow
+
+    flow = Flow.from_client_config(_CLIENT_CONFIG, scopes=SCOPES)
     flow.redirect_uri = REDIRECT_URI
     return flow
 
 
+def _refresh_access_token(refresh_token):
+    """
+    Exchange a refresh token for a new access token.
+    
+    A single POST to the token endpoint, which keeps google-auth's
+    transport layer off the request path entirely.
+    """
+    response = _client.post(
+        'https://oauth2.googleapis.com/token',
+        data={
+            'client_id': GOOGLE_CLIENT_ID,
+            'client_secret': GOOGLE_CLIENT_SECRET,
+            'refresh_token': refresh_token,
+            'grant_type': 'refresh_token',
+        },
+        timeout=5
+    )
+    response.raise_for_status()
+    return response.json()
+
+
+# Credentials reused across warm invocations while the stored token is unchanged
+_cached_creds = None
+_cached_creds_key = None
+
+
 def get_credentials():
     """Get valid credentials from storage"""
-    if 'token' not in token_storage:
+    global _cached_creds, _cached_creds_key
+    
+    token_data = store.get_token()
+    if not token_data:
         return None
     
-    token_data = token_storage['token']
+    key = (token_data['access_token'], token_data.get('refresh_token'))
+    if key == _cached_creds_key and not _cached_creds.expired:
+        return _cached_creds
+    
+    expiry = token_data.get('expiry')
     creds = Credentials(
         token=token_data['access_token'],
         refresh_token=token_data.get('refresh_token'),
         token_uri='https://oauth2.googleapis.com/token',
         client_id=GOOGLE_CLIENT_ID,
         client_secret=GOOGLE_CLIENT_SECRET,
+        expiry=datetime.fromisoformat(expiry) if expiry else None,
     )
     
     if creds.expired and creds.refresh_token:
-        creds.refresh(GoogleRequest())
-        token_storage['token']['access_token'] = creds.token
+        refreshed = _refresh_access_token(creds.refresh_token)
+        creds.token = refreshed['access_token']
+        creds.expiry = datetime.utcnow() + timedelta(seconds=refreshed.get('expires_in', 3600))
+        token_data['access_token'] = creds.token
+        token_data['expiry'] = creds.expiry.isoformat()
+        store.set_token(token_data)
     
+    _cached_creds = creds
+    _cached_creds_key = (creds.token, creds.refresh_token)
     return creds
 
 
-def drive_api_request(creds, endpoint, params=None):
-    """Make a request to Google Drive API using requests library"""
+def get_client():
+    """Return the shared pooled HTTP client"""
+    return _client
+
+
+def drive_api_get(creds, endpoint, params=None, etag=None):
+    """
+    GET a Drive API endpoint and return the raw response.
+    
+    When etag is given it is sent as If-None-Match, so an unchanged
+    resource comes back as an empty 304.
+    """
     headers = {'Authorization': f'Bearer {creds.token}'}
+    if etag:
+        headers['If-None-Match'] = etag
     url = f'https://www.googleapis.com/drive/v3/{endpoint}'
-    response = requests.get(url, headers=headers, params=params)
-    return response.json()
+    return _client.get(url, headers=headers, params=params)
+
+
+def drive_api_request(creds, endpoint, params=None):
+    """Make a request to Google Drive API using the shared client"""
+    return drive_api_get(creds, endpoint, params).json()
+
+
+# Drive accepts at most 100 sub-requests per batch call
+_BATCH_LIMIT = 100
+
+
+def drive_api_batch(creds, endpoints):
+    """
+    Fetch several Drive GET endpoints using the multipart batch API.
+    
+    endpoints are paths relative to drive/v3 (query string included),
+    e.g. "files/<id>?fields=webViewLink". Returns the parsed JSON body
+    for each endpoint in the same order, or None for failed sub-requests.
+    """
+    results = []
+    for start in range(0, len(endpoints), _BATCH_LIMIT):
+        chunk = endpoints[start:start + _BATCH_LIMIT]
+        boundary = f'batch_{uuid.uuid4().hex}'
+        parts = [
+            f'--{boundary}\r\n'
+            'Content-Type: application/http\r\n'
+            f'Content-ID: <item{i}>\r\n\r\n'
+            f'GET /drive/v3/{endpoint}\r\n\r\n'
+            for i, endpoint in enumerate(chunk)
+        ]
+        body = ''.join(parts) + f'--{boundary}--\r\n'
+        
+        response = _client.post(
+            'https://www.googleapis.com/batch/drive/v3',
+            headers={
+                'Authorization': f'Bearer {creds.token}',
+                'Content-Type': f'multipart/mixed; boundary={boundary}',
+            },
+            content=body.encode()
+        )
+        response.raise_for_status()
+        
+        chunk_results = [None] * len(chunk)
+        for index, status, payload in parse_batch_response(response):
+            if 0 <= index < len(chunk) and status == 200:
+                chunk_results[index] = payload
+        results.extend(chunk_results)
+    return results
+
+
+def parse_batch_response(response):
+    """Yield (item index, HTTP status, parsed JSON) for each batch part"""
+    content_type = response.headers.get('Content-Type', '')
+    boundary = content_type.partition('boundary=')[2].strip('"')
+    text = response.text.replace('\r\n', '\n')
+    
+    for part in text.split(f'--{boundary}'):
+        # Each part is: outer MIME headers, blank line, embedded HTTP response
+        outer, _, inner = part.strip().partition('\n\n')
+        content_id = ''
+        for line in outer.split('\n'):
+            if line.lower().startswith('content-id:'):
+                content_id = line.split(':', 1)[1].strip().strip('<>')
+        if not content_id:
+            continue
+        
+        head, _, payload = inner.partition('\n\n')
+        status_line = head.split('\n', 1)[0].split()
+        try:
+            index = int(content_id.rpartition('item')[2])
+            status = int(status_line[1])
+            data = json_loads(payload) if payload.strip() else None
+        except (ValueError, IndexError):
+            continue
+        yield index, status, data
+
+
+# Recent Drive list responses: (token, pageToken, q) -> (etag, body)
+_list_cache = OrderedDict()
+_LIST_CACHE_SIZE = 64
+
+
+def drive_list_cached(creds, params):
+    """List Drive files, revalidating a cached page with its ETag"""
+    key = (creds.token, params.get('pageToken'), params.get('q'))
+    cached = _list_cache.get(key)
+    
+    response = drive_api_get(creds, 'files', params, etag=cached[0] if cached else None)
+    if response.status_code == 304 and cached:
+        _list_cache.move_to_end(key)
+        return cached[1]
+    
+    result = response.json()
+    etag = response.headers.get('ETag')
+    if response.status_code == 200 and etag:
+        _list_cache[key] = (etag, result)
+        _list_cache.move_to_end(key)
+        if len(_list_cache) > _LIST_CACHE_SIZE:
+            _list_cache.popitem(last=False)
+    return result
+
+
+def parse_query(query_str):
+    """
+    Parse a query string into {key: [values]}, like parse_qs.
+    
+    The API only ever reads a handful of simple keys (code, pageToken,
+    query, q, include_links), so a split-and-unquote is all it needs.
+    Blank values are dropped, matching parse_qs defaults.
+    """
+    query = {}
+    for pair in query_str.split('&'):
+        key, _, value = pair.partition('=')
+        if not value:
+            continue
+        query.setdefault(unquote_plus(key), []).append(unquote_plus(value))
+    return query
+
+
+def escape_drive_query(value):
+    """Escape a string for use inside a quoted Drive query literal"""
+    return value.replace('\\', '\\\\').replace("'", "\\'")
+
+
+def parse_file_id(file_id):
+    """Convert the id segment of /api/files/<id> to an int (None if invalid)"""
+    try:
+        return int(file_id)
+    except ValueError:
+        return None
+
+
+def public_record(record):
+    """Copy of a stored file record without internal fields (the sort key)"""
+    return {k: v for k, v in record.items() if k != 'created_at_ts'}
 
 
 class handler(BaseHTTPRequestHandler):
@@ -89,70 +440,91 @@ class handler(BaseHTTPRequestHandler):
         self.send_header('Access-Control-Allow-Headers', 'Content-Type')
         self.end_headers()
     
+    # Exact-path dispatch tables. GET handlers receive the parsed query,
+    # POST handlers the parsed JSON body, so every route shares a signature.
+    _GET_ROUTES = {
+        '/api/_warmup': 'handle_warmup',
+        '/api/auth/status': 'handle_auth_status',
+        '/api/auth/login': 'handle_auth_login',
+        '/api/auth/callback': 'handle_auth_callback',
+        '/api/drive/files': 'handle_drive_files',
+        '/api/files': 'handle_list_files',
+        '/api/files/search': 'handle_search_files',
+    }
+    _POST_ROUTES = {
+        '/api/auth/logout': 'handle_logout',
+        '/api/drive/import': 'handle_import',
+    }
+    
+    def split_path(self):
+        """Split the request target into (path, raw query string)"""
+        idx = self.path.find('?')
+        if idx < 0:
+            return self.path, ''
+        return self.path[:idx], self.path[idx + 1:]
+    
     def do_GET(self):
-        parsed = urlparse(self.path)
-        path = parsed.path
-        query = parse_qs(parsed.query)
+        path, query_str = self.split_path()
+        # Most requests carry no query string - skip parsing for those
+        query = parse_query(query_str) if query_str else {}
         
-        if path == '/api/auth/status':
-            self.handle_auth_status()
-        elif path == '/api/auth/login':
-            self.handle_auth_login()
-        elif path == '/api/auth/callback':
-            self.handle_auth_callback(query)
-        elif path == '/api/drive/files':
-            self.handle_drive_files(query)
-        elif path == '/api/files':
-            self.handle_list_files()
-        elif path == '/api/files/search':
-            self.handle_search_files(query)
+        name = self._GET_ROUTES.get(path)
+        if name:
+            getattr(self, name)(query)
         elif path.startswith('/api/files/'):
-            file_id = path.split('/')[-1]
+            file_id = path.rpartition('/')[2]
             self.handle_get_file(file_id)
         else:
-            self.send_json({'error': 'Not found'}, 404)
+            self.send_raw(_NOT_FOUND_JSON, 404)
     
     def do_POST(self):
-        parsed = urlparse(self.path)
-        path = parsed.path
+        path, _ = self.split_path()
+        
+        name = self._POST_ROUTES.get(path)
+        if not name:
+            self.send_raw(_NOT_FOUND_JSON, 404)
+            return
         
         content_length = int(self.headers.get('Content-Length', 0))
-        body = self.rfile.read(content_length).decode('utf-8') if content_length > 0 else '{}'
+        body = self.rfile.read(content_length) if content_length > 0 else b''
         
         try:
-            data = json.loads(body) if body else {}
+            data = json_loads(body) if body else {}
         except:
             data = {}
         
-        if path == '/api/auth/logout':
-            self.handle_logout()
-        elif path == '/api/drive/import':
-            self.handle_import(data)
-        else:
-            self.send_json({'error': 'Not found'}, 404)
+        getattr(self, name)(data)
     
     def do_DELETE(self):
-        parsed = urlparse(self.path)
-        path = parsed.path
+        path, _ = self.split_path()
         
         if path.startswith('/api/files/'):
-            file_id = path.split('/')[-1]
+            file_id = path.rpartition('/')[2]
             self.handle_delete_file(file_id)
         else:
-            self.send_json({'error': 'Not found'}, 404)
+            self.send_raw(_NOT_FOUND_JSON, 404)
     
     def send_json(self, data, status=200):
+        self.send_raw(json_dumps(data), status)
+    
+    def send_raw(self, body_bytes, status=200):
+        """Send an already-encoded JSON body"""
         self.send_response(status)
         self.send_header('Content-Type', 'application/json')
         self.send_header('Access-Control-Allow-Origin', '*')
         self.end_headers()
-        self.wfile.write(json.dumps(data).encode())
+        self.wfile.write(body_bytes)
     
-    def handle_auth_status(self):
-        authenticated = 'token' in token_storage and token_storage['token'].get('access_token')
-        self.send_json({'authenticated': bool(authenticated)})
+    def handle_warmup(self, query):
+        # Keep-alive ping - must not touch OAuth or Drive
+        self.send_json({'ok': True})
     
-    def handle_auth_login(self):
+    def handle_auth_status(self, query):
+        token_data = store.get_token()
+        authenticated = token_data and token_data.get('access_token')
+        self.send_raw(_AUTH_TRUE if authenticated else _AUTH_FALSE)
+    
+    def handle_auth_login(self, query):
         flow = create_oauth_flow()
         auth_url, _ = flow.authorization_url(
             access_type='offline',
@@ -175,10 +547,11 @@ class handler(BaseHTTPRequestHandler):
             flow.fetch_token(code=code)
             creds = flow.credentials
             
-            token_storage['token'] = {
+            store.set_token({
                 'access_token': creds.token,
                 'refresh_token': creds.refresh_token,
-            }
+                'expiry': creds.expiry.isoformat() if creds.expiry else None,
+            })
             
             self.send_response(302)
             self.send_header('Location', f'{FRONTEND_URL}?success=true')
@@ -188,9 +561,8 @@ class handler(BaseHTTPRequestHandler):
             self.send_header('Location', f'{FRONTEND_URL}?error={str(e)}')
             self.end_headers()
     
-    def handle_logout(self):
-        token_storage.clear()
-        files_storage.clear()
+    def handle_logout(self, data):
+        store.clear()
         self.send_json({'success': True})
     
     def handle_drive_files(self, query):
@@ -213,9 +585,9 @@ class handler(BaseHTTPRequestHandler):
             
             search = query.get('query', [None])[0]
             if search:
-                params['q'] = f"trashed=false and name contains '{search}'"
+                params['q'] = f"trashed=false and name contains '{escape_drive_query(search)}'"
             
-            result = drive_api_request(creds, 'files', params)
+            result = drive_list_cached(creds, params)
             self.send_json(result)
         except Exception as e:
             self.send_json({'error': str(e)}, 500)
@@ -231,64 +603,84 @@ class handler(BaseHTTPRequestHandler):
         mime_type = data.get('mime_type')
         size = data.get('size')
         
-        if file_id in files_storage:
+        if store.has_file(file_id):
             self.send_json({'error': 'File already imported'}, 409)
             return
         
         try:
-            file_record = {
-                'id': len(files_storage) + 1,
+            # One clock read per import: numeric sort key plus display string
+            created_at_ts = time.time()
+            file_record = store.add_file({
                 'name': file_name,
                 'mime_type': mime_type,
                 'size': size,
                 'google_drive_id': file_id,
-                'created_at': datetime.utcnow().isoformat()
-            }
-            files_storage[file_id] = file_record
+                'created_at': datetime.utcfromtimestamp(created_at_ts).isoformat(),
+                'created_at_ts': created_at_ts
+            })
+            if file_record is None:
+                self.send_json({'error': 'File already imported'}, 409)
+                return
             
-            self.send_json({'success': True, 'file': file_record})
+            self.send_json({'success': True, 'file': public_record(file_record)})
         except Exception as e:
             self.send_json({'error': str(e)}, 500)
     
-    def handle_list_files(self):
-        files = list(files_storage.values())
-        files.sort(key=lambda x: x.get('created_at', ''), reverse=True)
-        self.send_json({'files': files})
+    def handle_list_files(self, query):
+        files = store.list_files()
+        files.sort(key=lambda x: x.get('created_at_ts', 0.0), reverse=True)
+        
+        # Optionally enrich every record with its Drive link in one batch call
+        if files and query.get('include_links', [''])[0] == '1':
+            creds = get_credentials()
+            if creds:
+                try:
+                    links = drive_api_batch(creds, [
+                        f"files/{f['google_drive_id']}?fields=webViewLink" for f in files
+                    ])
+                    files = [
+                        {**f, 'webViewLink': link.get('webViewLink')} if link else f
+                        for f, link in zip(files, links)
+                    ]
+                except Exception:
+                    pass
+        
+        self.send_json({'files': [public_record(f) for f in files]})
     
     def handle_search_files(self, query):
         search = query.get('q', [''])[0].lower()
-        files = [f for f in files_storage.values() if search in f.get('name', '').lower()]
-        self.send_json({'files': files})
+        files = store.search_files(search)
+        self.send_json({'files': [public_record(f) for f in files]})
     
     def handle_get_file(self, file_id):
-        for f in files_storage.values():
-            if str(f['id']) == file_id:
-                creds = get_credentials()
-                if creds:
-                    try:
-                        result = drive_api_request(
-                            creds, 
-                            f"files/{f['google_drive_id']}", 
-                            {'fields': 'webViewLink'}
-                        )
-                        if 'webViewLink' in result:
-                            self.send_response(302)
-                            self.send_header('Location', result['webViewLink'])
-                            self.end_headers()
-                            return
-                    except:
-                        pass
-                
-                self.send_json({'error': 'Cannot view file'}, 500)
-                return
+        numeric_id = parse_file_id(file_id)
+        f = store.get_file(numeric_id) if numeric_id is not None else None
+        if f is None:
+            self.send_json({'error': 'File not found'}, 404)
+            return
+        
+        creds = get_credentials()
+        if creds:
+            try:
+                result = drive_api_request(
+                    creds, 
+                    f"files/{f['google_drive_id']}", 
+                    {'fields': 'webViewLink'}
+                )
+                if 'webViewLink' in result:
+                    self.send_response(302)
+                    self.send_header('Location', result['webViewLink'])
+                    self.end_headers()
+                    return
+            except:
+                pass
         
-        self.send_json({'error': 'File not found'}, 404)
+        self.send_json({'error': 'Cannot view file'}, 500)
     
     def handle_delete_file(self, file_id):
-        for gid, f in list(files_storage.items()):
-            if str(f['id']) == file_id:
-                del files_storage[gid]
-                self.send_json({'success': True})
-                return
+        numeric_id = parse_file_id(file_id)
+        if numeric_id is None or not store.delete_file(numeric_id):
+            self.send_json({'error': 'File not found'}, 404)
+            return
         
-        self.send_json({'error': 'File not found'}, 404)
+        self.send_json({'success': True})
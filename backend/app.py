@@ -13,8 +13,20 @@ Assessment: Senior Full Stack Engineer (Python/Flask/React)
 """
 
 import os
-from flask import Flask, request, jsonify, redirect, send_file
+import re
+import tempfile
+import hashlib
+import threading
+import unicodedata
+from urllib.parse import quote
+from concurrent.futures import ThreadPoolExecutor
+from cachetools import TTLCache
+from flask import Flask, Response, request, jsonify, redirect, send_file, abort
 from flask_cors import CORS
+from sqlalchemy import delete, event, func, insert, inspect, select, text
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.exc import DBAPIError, OperationalError
 from datetime import datetime, timedelta
 from config import Config
 from models import db, OAuthToken, File
@@ -22,11 +34,31 @@ from google_auth import (
     create_oauth_flow, 
     get_credentials_from_token, 
     get_drive_service,
-    list_drive_files,
-    download_file
+    list_drive_files_cached,
+    batch_get_metadata,
+    get_file_checksum,
+    download_file,
+    EXPORT_MIME_TYPES
 )
 from google.auth.transport.requests import Request as GoogleRequest
 
+# Maximum number of Drive downloads running at once for a batch import
+# Keeps us well inside Drive's per-user request rate limits
+IMPORT_CONCURRENCY = 8
+
+# Shared pool for blocking disk and Drive I/O, created once per worker
+# process rather than per request; threads release the GIL while they wait
+EXECUTOR = ThreadPoolExecutor(max_workers=32, thread_name_prefix='io')
+
+# Anything other than word characters, spaces, dots and dashes is stripped
+# from filenames before they're written to disk
+_UNSAFE_FILENAME_RE = re.compile(r'[^\w .\-]+')
+
+# Recently rendered listing JSON, keyed by the listing ETag
+# Guarded by a lock since gunicorn runs threaded workers
+_listing_cache = TTLCache(maxsize=16, ttl=5)
+_listing_cache_lock = threading.Lock()
+
 # Initialize Flask app with configuration
 app = Flask(__name__)
 app.config.from_object(Config)
@@ -41,10 +73,112 @@ db.init_app(app)
 # Make sure the uploads directory exists for storing imported files
 os.makedirs(Config.UPLOAD_FOLDER, exist_ok=True)
 
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    """
+    Tune each new SQLite connection for concurrent reads during imports.
+    
+    WAL lets readers (the UI polling /api/files) proceed while an import
+    is writing, instead of blocking on the rollback journal lock.
+    """
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")  # Safe with WAL, far fewer fsyncs
+    cursor.execute("PRAGMA temp_store=MEMORY")
+    cursor.execute("PRAGMA mmap_size=268435456")  # 256 MB
+    cursor.execute("PRAGMA cache_size=-64000")  # ~64 MB
+    cursor.close()
+
+
+# Trigram FTS5 index over file names, kept in sync with the files table by
+# triggers. The trigram tokenizer matches arbitrary substrings, so it can
+# stand in for LIKE '%q%' for any query of at least three characters
+_SQLITE_FTS_DDL = (
+    "CREATE VIRTUAL TABLE files_fts USING fts5("
+    "name, content='files', content_rowid='id', tokenize='trigram')",
+    "CREATE TRIGGER files_fts_ai AFTER INSERT ON files BEGIN "
+    "INSERT INTO files_fts(rowid, name) VALUES (new.id, new.name); END",
+    "CREATE TRIGGER files_fts_ad AFTER DELETE ON files BEGIN "
+    "INSERT INTO files_fts(files_fts, rowid, name) VALUES ('delete', old.id, old.name); END",
+    "CREATE TRIGGER files_fts_au AFTER UPDATE OF name ON files BEGIN "
+    "INSERT INTO files_fts(files_fts, rowid, name) VALUES ('delete', old.id, old.name); "
+    "INSERT INTO files_fts(rowid, name) VALUES (new.id, new.name); END",
+    # Index any rows that predate the FTS table
+    "INSERT INTO files_fts(files_fts) VALUES ('rebuild')",
+)
+
+
+def _setup_sqlite_fts():
+    """
+    Create the files_fts search index if it doesn't exist yet.
+    
+    Returns:
+        True if FTS search is available, False if this SQLite build lacks
+        FTS5 or the trigram tokenizer (search then falls back to LIKE)
+    """
+    def fts_exists():
+        with db.engine.connect() as conn:
+            return conn.execute(
+                text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'files_fts'")
+            ).scalar() is not None
+    
+    if fts_exists():
+        return True
+    try:
+        with db.engine.begin() as conn:
+            for statement in _SQLITE_FTS_DDL:
+                conn.execute(text(statement))
+    except OperationalError as e:
+        # Another process booting at the same time may have created it first
+        if fts_exists():
+            return True
+        app.logger.warning(f"FTS5 search unavailable, using LIKE: {e}")
+        return False
+    return True
+
+
+def _add_md5_column():
+    """
+    Add files.md5 (and its index) to databases created before it existed.
+    
+    create_all only creates missing tables, not missing columns, so
+    without this every import against an older database would fail.
+    """
+    def has_md5():
+        columns = inspect(db.engine).get_columns(File.__tablename__)
+        return any(c['name'] == 'md5' for c in columns)
+    
+    if has_md5():
+        return
+    try:
+        with db.engine.begin() as conn:
+            conn.execute(text(f"ALTER TABLE {File.__tablename__} ADD COLUMN md5 VARCHAR(32)"))
+            for index in File.__table__.indexes:
+                if [c.name for c in index.columns] == ['md5']:
+                    index.create(conn, checkfirst=True)
+    except DBAPIError:
+        # Another process booting at the same time may have added it first
+        if not has_md5():
+            raise
+        return
+    app.logger.info("Added md5 column to files table")
+
+
 # Create database tables on startup
 # In production, you'd want to use migrations (Flask-Migrate) instead
 with app.app_context():
+    # Register before the first connection is opened by create_all
+    if db.engine.dialect.name == 'sqlite':
+        event.listen(db.engine, 'connect', _set_sqlite_pragmas)
     db.create_all()
+    _add_md5_column()
+    # Superseded by the FTS/trigram search indexes; only cost writes
+    with db.engine.begin() as conn:
+        conn.execute(text("DROP INDEX IF EXISTS ix_files_name_lower"))
+    SQLITE_FTS = db.engine.dialect.name == 'sqlite' and _setup_sqlite_fts()
+    # gunicorn --preload runs this once in the master before forking, so
+    # don't let workers inherit (and share) its pooled connections
+    db.engine.dispose()
 
 
 # =============================================================================
@@ -232,6 +366,203 @@ def get_valid_credentials():
     return creds
 
 
+def storage_path(file_id, final_name):
+    """Local path for an imported file: Drive ID prefix plus sanitized name."""
+    # Remove any characters that could cause filesystem issues
+    safe_name = _UNSAFE_FILENAME_RE.sub('', final_name).strip()
+    # Prefix with file_id to ensure uniqueness
+    return os.path.join(Config.UPLOAD_FOLDER, f"{file_id}_{safe_name}")
+
+
+def find_stored_copies(checksums):
+    """
+    Map content checksums to the local path of a file already storing them.
+    
+    Args:
+        checksums: Iterable of Drive md5Checksum values
+        
+    Returns:
+        Dictionary of md5 -> local_path for checksums we already have
+    """
+    checksums = [c for c in checksums if c]
+    if not checksums:
+        return {}
+    rows = db.session.execute(
+        select(File.md5, File.local_path).where(File.md5.in_(checksums))
+    )
+    return {md5: local_path for md5, local_path in rows}
+
+
+def download_to_storage(creds, file_id, file_name, mime_type, duplicate_of=None):
+    """
+    Download a Drive file into the upload folder.
+    
+    Safe to call from worker threads: get_drive_service hands each thread
+    its own service, since the underlying httplib2 transport isn't
+    thread-safe.
+    
+    Args:
+        duplicate_of: Local path of a stored file with identical content.
+                      If given, it's hard-linked instead of re-downloaded.
+    
+    Returns:
+        Tuple of (final_name, final_mime, local_path, downloaded_bytes)
+    """
+    # Same content already on disk - link it instead of downloading. Hard
+    # links keep each copy valid on its own when the other is deleted.
+    if duplicate_of:
+        local_path = storage_path(file_id, file_name)
+        try:
+            os.link(duplicate_of, local_path)
+            return file_name, mime_type, local_path, os.stat(local_path).st_size
+        except OSError as e:
+            # Original gone or hard links unsupported - fall back to downloading
+            app.logger.warning(f"Could not link {duplicate_of}: {e}")
+    
+    # The final name (export extension included) is only known after the
+    # download, so stream into a temporary file and rename it afterwards.
+    # Each call gets its own temp file so concurrent imports of the same
+    # Drive file can't interleave writes
+    fd, partial_path = tempfile.mkstemp(dir=Config.UPLOAD_FOLDER, suffix='.part')
+    
+    try:
+        service = get_drive_service(creds)
+        
+        # Stream the file to disk (handles Google Docs export automatically)
+        with os.fdopen(fd, 'wb') as f:
+            final_name, final_mime, downloaded_bytes = download_file(
+                service, file_id, file_name, mime_type, f
+            )
+        
+        # mkstemp creates the file owner-only; keep the permissions regular
+        # uploads had so a fronting web server can still read it
+        os.chmod(partial_path, 0o644)
+        local_path = storage_path(file_id, final_name)
+        os.replace(partial_path, local_path)
+    except Exception:
+        if os.path.exists(partial_path):
+            os.remove(partial_path)
+        raise
+    
+    return final_name, final_mime, local_path, downloaded_bytes
+
+
+def _persist_files_bulk(records):
+    """
+    Insert many File rows with a single INSERT and a single commit.
+    
+    Uses SQLAlchemy's bulk INSERT ... RETURNING path, which skips the
+    per-object unit-of-work bookkeeping but still hands back File
+    objects (with ids) for the response. Rows whose Drive file was
+    imported concurrently by another request are skipped rather than
+    failing the whole batch (ON CONFLICT DO NOTHING on SQLite/Postgres).
+    
+    Args:
+        records: List of dicts of File column values
+        
+    Returns:
+        List of the File objects actually inserted
+    """
+    if not records:
+        return []
+    
+    dialect = db.engine.dialect.name
+    if dialect == 'sqlite':
+        stmt = sqlite_insert(File).on_conflict_do_nothing(index_elements=['google_drive_id'])
+    elif dialect == 'postgresql':
+        stmt = postgresql_insert(File).on_conflict_do_nothing(index_elements=['google_drive_id'])
+    else:
+        stmt = insert(File)
+    
+    try:
+        with db.session.no_autoflush:
+            files = db.session.scalars(stmt.returning(File), records).all()
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    return files
+
+
+def _remove_unreferenced(paths):
+    """
+    Delete downloaded files that no File row points at.
+    
+    Paths are deterministic per Drive file, so a concurrent import of the
+    same file may own the path now - those are left alone.
+    """
+    paths = set(paths)
+    if not paths:
+        return
+    referenced = set(db.session.scalars(
+        select(File.local_path).where(File.local_path.in_(list(paths)))
+    ))
+    for path in paths - referenced:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+# Columns exposed by listings - everything in File.to_dict(), minus local_path
+LISTING_COLUMNS = (
+    File.id, File.name, File.mime_type, File.size, File.google_drive_id, File.created_at
+)
+
+
+def listing_row_to_dict(row):
+    """Build the File.to_dict() shape straight from a LISTING_COLUMNS row."""
+    return dict(row._mapping) | {
+        'created_at': row.created_at.isoformat() if row.created_at else None
+    }
+
+
+def _listing_version():
+    """
+    Cheap fingerprint of the files table: newest created_at and row count.
+    
+    Any import bumps the max timestamp and any delete changes the count,
+    so listings only need to be re-rendered when this changes.
+    """
+    max_created, count = db.session.execute(
+        select(func.max(File.created_at), func.count(File.id))
+    ).one()
+    return f'{max_created.isoformat() if max_created else ""}:{count}'
+
+
+def _cached_listing(extra_key, render):
+    """
+    Serve a file listing with ETag revalidation and a short-lived cache.
+    
+    Args:
+        extra_key: Anything besides the table version that affects the
+                   result (e.g. the search query)
+        render: Callable returning the JSON-serializable response body
+        
+    Returns:
+        A 304 if the client's copy is current, else the (cached) JSON response
+    """
+    etag = hashlib.blake2b(
+        f'{_listing_version()}:{extra_key}'.encode(), digest_size=8
+    ).hexdigest()
+    
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        with _listing_cache_lock:
+            body = _listing_cache.get(etag)
+        if body is None:
+            body = app.json.dumps(render())
+            with _listing_cache_lock:
+                _listing_cache[etag] = body
+        response = Response(body, mimetype='application/json')
+    
+    response.set_etag(etag)
+    # Let the browser keep the listing but always revalidate it
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+
 # =============================================================================
 # Google Drive Routes
 # These endpoints interact with the Google Drive API
@@ -248,6 +579,7 @@ def drive_files():
     Query Parameters:
         pageToken: Token for pagination (from previous response)
         query: Search string to filter files by name
+        minimal_fields: If "1", omit iconLink/thumbnailLink from results
         
     Returns:
         JSON with 'files' array and optional 'nextPageToken'
@@ -257,11 +589,11 @@ def drive_files():
         return jsonify({'error': 'Not authenticated'}), 401
     
     try:
-        service = get_drive_service(creds)
         page_token = request.args.get('pageToken')
         query = request.args.get('query')
+        minimal_fields = request.args.get('minimal_fields') == '1'
         
-        results = list_drive_files(service, page_token, query)
+        results = list_drive_files_cached(creds, page_token, query, minimal_fields)
         return jsonify(results)
     except Exception as e:
         app.logger.error(f"Error listing drive files: {e}")
@@ -286,7 +618,8 @@ def import_file():
         size: File size in bytes (optional)
         
     Returns:
-        JSON with 'success' boolean and 'file' object
+        JSON with 'success' boolean and 'file' object, or 409 with the
+        existing 'file_id' if this Drive file was already imported
     """
     creds = get_valid_credentials()
     if not creds:
@@ -299,39 +632,36 @@ def import_file():
     size = data.get('size')
     
     # Prevent duplicate imports - each file can only be imported once
-    existing = File.query.filter_by(google_drive_id=file_id).first()
-    if existing:
-        return jsonify({'error': 'File already imported', 'file': existing.to_dict()}), 409
+    # Only the primary key is needed here, served straight from the unique index
+    existing_id = db.session.execute(
+        select(File.id).where(File.google_drive_id == file_id)
+    ).scalar()
+    if existing_id:
+        return jsonify({'error': 'File already imported', 'file_id': existing_id}), 409
     
     try:
-        service = get_drive_service(creds)
+        # Identical content may already be stored under another Drive ID
+        # (copies, shared files) - reuse it instead of downloading again.
+        # Workspace files are exported and have no checksum, so skip the
+        # extra Drive round trip for them
+        if mime_type in EXPORT_MIME_TYPES:
+            md5 = None
+        else:
+            md5 = get_file_checksum(get_drive_service(creds), file_id)
+        duplicate_of = find_stored_copies([md5]).get(md5)
         
-        # Download the file (handles Google Docs export automatically)
-        file_buffer, final_name, final_mime = download_file(
-            service, file_id, file_name, mime_type
+        final_name, final_mime, local_path, downloaded_bytes = download_to_storage(
+            creds, file_id, file_name, mime_type, duplicate_of
         )
         
-        # Create a safe filename for local storage
-        # Remove any characters that could cause filesystem issues
-        safe_name = "".join(
-            c for c in final_name 
-            if c.isalnum() or c in (' ', '.', '-', '_')
-        ).strip()
-        
-        # Prefix with file_id to ensure uniqueness
-        local_path = os.path.join(Config.UPLOAD_FOLDER, f"{file_id}_{safe_name}")
-        
-        # Write the file to disk
-        with open(local_path, 'wb') as f:
-            f.write(file_buffer.read())
-        
         # Save file metadata to database
         file_record = File(
             name=final_name,
             mime_type=final_mime,
-            size=size or os.path.getsize(local_path),
+            size=size or downloaded_bytes,
             google_drive_id=file_id,
-            local_path=local_path
+            local_path=local_path,
+            md5=md5
         )
         db.session.add(file_record)
         db.session.commit()
@@ -344,6 +674,145 @@ def import_file():
         return jsonify({'error': str(e)}), 500
 
 
+@app.route('/api/drive/import_batch', methods=['POST'])
+def import_batch():
+    """
+    Import several files from Google Drive in one request.
+    
+    Downloads run concurrently (at most IMPORT_CONCURRENCY at a time) so
+    Drive latency overlaps instead of adding up, and all metadata rows
+    are committed together once every download has finished.
+    
+    Request Body (JSON):
+        files: List of objects with file_id, name, mime_type, size
+        
+    Returns:
+        JSON with imported 'files', 'skipped' Drive IDs (already imported)
+        and 'errors' for downloads that failed
+    """
+    creds = get_valid_credentials()
+    if not creds:
+        return jsonify({'error': 'Not authenticated'}), 401
+    
+    data = request.json or {}
+    requested = {f['file_id']: f for f in data.get('files', []) if f.get('file_id')}
+    
+    # Skip anything that's already in the data room
+    already_imported = {
+        gid for (gid,) in db.session.query(File.google_drive_id).filter(
+            File.google_drive_id.in_(list(requested))
+        )
+    }
+    pending = [f for gid, f in requested.items() if gid not in already_imported]
+    
+    records = []
+    errors = []
+    
+    # Validate everything up front with batched metadata lookups, so missing
+    # or inaccessible files fail fast without a download attempt
+    if pending:
+        try:
+            metadata = batch_get_metadata(get_drive_service(creds), [m['file_id'] for m in pending])
+        except Exception as e:
+            app.logger.error(f"Error fetching drive metadata for batch import: {e}")
+            return jsonify({'error': str(e)}), 500
+        validated = []
+        for meta in pending:
+            info = metadata.get(meta['file_id'])
+            if info is None:
+                errors.append({'file_id': meta['file_id'], 'error': 'File not found in Google Drive'})
+                continue
+            validated.append({
+                'file_id': meta['file_id'],
+                'name': meta.get('name') or info.get('name'),
+                'mime_type': meta.get('mime_type') or info.get('mimeType'),
+                'size': meta.get('size') or info.get('size'),
+                'md5': info.get('md5Checksum'),
+            })
+        pending = validated
+    
+    # Content we already store gets hard-linked instead of downloaded
+    stored_copies = find_stored_copies({meta['md5'] for meta in pending})
+    
+    # The pool is shared with other requests, so cap this batch's share of it
+    slots = threading.BoundedSemaphore(IMPORT_CONCURRENCY)
+    futures = []
+    for meta in pending:
+        slots.acquire()
+        future = EXECUTOR.submit(
+            download_to_storage,
+            creds, meta['file_id'], meta.get('name'), meta.get('mime_type'),
+            stored_copies.get(meta['md5'])
+        )
+        future.add_done_callback(lambda _: slots.release())
+        futures.append(future)
+    
+    for meta, future in zip(pending, futures):
+        try:
+            final_name, final_mime, local_path, downloaded_bytes = future.result()
+        except Exception as e:
+            app.logger.error(f"Error importing file {meta['file_id']}: {e}")
+            errors.append({'file_id': meta['file_id'], 'error': str(e)})
+            continue
+        records.append({
+            'name': final_name,
+            'mime_type': final_mime,
+            'size': meta.get('size') or downloaded_bytes,
+            'google_drive_id': meta['file_id'],
+            'local_path': local_path,
+            'md5': meta['md5']
+        })
+    
+    try:
+        files = _persist_files_bulk(records)
+    except Exception as e:
+        app.logger.error(f"Error saving batch import: {e}")
+        # Nothing was recorded, so don't leave the downloads orphaned on disk
+        _remove_unreferenced(r['local_path'] for r in records)
+        return jsonify({'error': str(e)}), 500
+    
+    # Anything not inserted was imported by a concurrent request meanwhile
+    inserted = {f.google_drive_id for f in files}
+    conflicts = [r for r in records if r['google_drive_id'] not in inserted]
+    _remove_unreferenced(r['local_path'] for r in conflicts)
+    
+    app.logger.info(f"Batch imported {len(files)} file(s)")
+    return jsonify({
+        'success': not errors,
+        'files': [f.to_dict() for f in files],
+        'skipped': sorted(already_imported | {r['google_drive_id'] for r in conflicts}),
+        'errors': errors
+    })
+
+
+@app.route('/api/drive/prefetch', methods=['POST'])
+def prefetch_metadata():
+    """
+    Fetch Drive metadata for several files in a single round trip.
+    
+    Useful before a bulk import to show names, sizes and types for a
+    selection without issuing one request per file.
+    
+    Request Body (JSON):
+        file_ids: List of Google Drive file IDs
+        
+    Returns:
+        JSON with 'files' mapping each found file ID to its metadata
+    """
+    creds = get_valid_credentials()
+    if not creds:
+        return jsonify({'error': 'Not authenticated'}), 401
+    
+    file_ids = (request.json or {}).get('file_ids', [])
+    
+    try:
+        service = get_drive_service(creds)
+        return jsonify({'files': batch_get_metadata(service, file_ids)})
+    except Exception as e:
+        app.logger.error(f"Error prefetching drive metadata: {e}")
+        return jsonify({'error': str(e)}), 500
+
+
 # =============================================================================
 # Data Room File Routes
 # CRUD operations for files stored in the data room
@@ -359,8 +828,30 @@ def list_files():
     Returns:
         JSON with 'files' array
     """
-    files = File.query.order_by(File.created_at.desc()).all()
-    return jsonify({'files': [f.to_dict() for f in files]})
+    def render():
+        rows = db.session.execute(
+            select(*LISTING_COLUMNS).order_by(File.created_at.desc())
+        ).all()
+        return {'files': [listing_row_to_dict(row) for row in rows]}
+    
+    return _cached_listing('', render)
+
+
+def _set_inline_disposition(response, filename):
+    """
+    Set an inline Content-Disposition header the same way send_file does.
+    
+    Non-ASCII names get an ASCII fallback plus an RFC 5987 filename*.
+    """
+    try:
+        filename.encode('ascii')
+    except UnicodeEncodeError:
+        simple = unicodedata.normalize('NFKD', filename).encode('ascii', 'ignore').decode('ascii')
+        quoted = quote(filename, safe="!#$&+-.^_`|~")
+        names = {'filename': simple, 'filename*': f"UTF-8''{quoted}"}
+    else:
+        names = {'filename': filename}
+    response.headers.set('Content-Disposition', 'inline', **names)
 
 
 @app.route('/api/files/<int:file_id>')
@@ -377,18 +868,42 @@ def get_file(file_id):
     Returns:
         The file content with appropriate headers
     """
-    file_record = File.query.get_or_404(file_id)
-    
-    # Make sure the file still exists on disk
-    if not os.path.exists(file_record.local_path):
+    # Only the columns needed to serve the file - no ORM object
+    file_record = db.session.execute(
+        select(File.local_path, File.mime_type, File.name).where(File.id == file_id)
+    ).first()
+    if file_record is None:
+        abort(404)
+    
+    # Behind nginx, hand the transfer off to the proxy entirely
+    if Config.X_ACCEL_REDIRECT_PREFIX:
+        response = Response(mimetype=file_record.mime_type)
+        _set_inline_disposition(response, file_record.name)
+        # Stored names keep Unicode and spaces, but header values must be
+        # latin-1; nginx decodes the percent-encoding before the lookup
+        response.headers['X-Accel-Redirect'] = (
+            f"{Config.X_ACCEL_REDIRECT_PREFIX.rstrip('/')}/"
+            f"{quote(os.path.basename(file_record.local_path))}"
+        )
+        return response
+    
+    # conditional=True lets Werkzeug answer If-None-Match with 304 and
+    # Range requests with 206, so viewer seeks don't resend the whole file.
+    # max_age=0 makes browsers revalidate every time: SQLite can hand a
+    # deleted file's id to a new import, so a cached copy may be stale.
+    # send_file stats the file itself for the ETag/Last-Modified headers,
+    # so a missing file surfaces here rather than via a separate check.
+    try:
+        return send_file(
+            file_record.local_path,
+            mimetype=file_record.mime_type,
+            as_attachment=False,  # Display in browser instead of download
+            download_name=file_record.name,
+            conditional=True,
+            max_age=0
+        )
+    except FileNotFoundError:
         return jsonify({'error': 'File not found on disk'}), 404
-    
-    return send_file(
-        file_record.local_path,
-        mimetype=file_record.mime_type,
-        as_attachment=False,  # Display in browser instead of download
-        download_name=file_record.name
-    )
 
 
 @app.route('/api/files/<int:file_id>', methods=['DELETE'])
@@ -405,15 +920,19 @@ def delete_file(file_id):
     Returns:
         JSON with 'success' boolean
     """
-    file_record = File.query.get_or_404(file_id)
+    # Delete the row and get back what we need for cleanup in one statement
+    file_record = db.session.execute(
+        delete(File).where(File.id == file_id).returning(File.local_path, File.name)
+    ).first()
+    if file_record is None:
+        abort(404)
+    db.session.commit()
     
     # Remove the file from disk
-    if os.path.exists(file_record.local_path):
+    try:
         os.remove(file_record.local_path)
-    
-    # Remove from database
-    db.session.delete(file_record)
-    db.session.commit()
+    except FileNotFoundError:
+        pass
     
     app.logger.info(f"Deleted file: {file_record.name}")
     return jsonify({'success': True})
@@ -424,7 +943,8 @@ def search_files():
     """
     Search files in the data room by name.
     
-    Performs a case-insensitive search on file names.
+    Performs a case-insensitive substring search on file names. Uses the
+    FTS5 trigram index on SQLite and the pg_trgm index on Postgres.
     
     Query Parameters:
         q: Search query string
@@ -432,12 +952,29 @@ def search_files():
     Returns:
         JSON with 'files' array of matching files
     """
+    # Left as typed: SQLite's lower() only folds ASCII, so lowercasing in
+    # Python would stop e.g. 'És' matching 'És.pdf'
     query = request.args.get('q', '')
-    files = File.query.filter(
-        File.name.ilike(f'%{query}%')
-    ).order_by(File.created_at.desc()).all()
     
-    return jsonify({'files': [f.to_dict() for f in files]})
+    def render():
+        if SQLITE_FTS and len(query) >= 3:
+            # Quote the query so FTS5 treats it as one literal substring
+            matches = text(
+                "SELECT rowid FROM files_fts WHERE files_fts MATCH :q"
+            ).bindparams(q='"' + query.replace('"', '""') + '"').columns(File.id)
+            condition = File.id.in_(matches)
+        else:
+            # Shorter queries have no trigrams to look up. On Postgres this is
+            # a plain ILIKE, which ix_files_name_trgm serves
+            condition = File.name.ilike(f'%{query}%')
+        rows = db.session.execute(
+            select(*LISTING_COLUMNS)
+            .where(condition)
+            .order_by(File.created_at.desc())
+        ).all()
+        return {'files': [listing_row_to_dict(row) for row in rows]}
+    
+    return _cached_listing(f'search:{query}', render)
 
 
 # =============================================================================
@@ -446,6 +983,8 @@ def search_files():
 
 if __name__ == '__main__':
     # Run in debug mode for development
-    # In production, use gunicorn: gunicorn -w 4 app:app
+    # In production, use gunicorn with threaded workers so requests blocked
+    # on Drive/disk I/O don't tie up a whole process:
+    #   gunicorn app:app --worker-class gthread --workers 2 --threads 16 --preload
     # Note: Port 5000 is often used by AirPlay on macOS, so we use 5001
     app.run(debug=True, port=5001)
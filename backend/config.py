@@ -12,6 +12,8 @@ Environment Variables:
     GOOGLE_REDIRECT_URI: OAuth callback URL (default: localhost:5001)
     SECRET_KEY: Flask secret key for session security
     FRONTEND_URL: URL of the React frontend for CORS and redirects
+    X_ACCEL_REDIRECT_PREFIX: nginx internal location serving the uploads
+                             directory (optional, enables X-Accel-Redirect)
 
 Author: Felix Gabriel Girola
 """
@@ -40,6 +42,17 @@ class Config:
     )
     SQLALCHEMY_TRACK_MODIFICATIONS = False  # Disable Flask-SQLAlchemy event system
     
+    # Connection pool settings - pre_ping drops dead connections before use
+    SQLALCHEMY_ENGINE_OPTIONS = {'pool_pre_ping': True}
+    if not SQLALCHEMY_DATABASE_URI.startswith('sqlite'):
+        # Server databases: larger pool for threaded workers, and READ
+        # COMMITTED (SQLite doesn't support this isolation level)
+        SQLALCHEMY_ENGINE_OPTIONS.update(
+            pool_size=10,
+            max_overflow=20,
+            isolation_level='READ COMMITTED'
+        )
+    
     # Google OAuth configuration
     # These MUST be set for the application to work
     GOOGLE_CLIENT_ID = os.getenv('GOOGLE_CLIENT_ID')
@@ -58,3 +71,7 @@ class Config:
         os.path.dirname(os.path.abspath(__file__)), 
         'uploads'
     )
+    
+    # When running behind nginx, set this to an internal location that maps
+    # to UPLOAD_FOLDER and file transfers are offloaded via X-Accel-Redirect
+    X_ACCEL_REDIRECT_PREFIX = os.getenv('X_ACCEL_REDIRECT_PREFIX')
@@ -15,10 +15,13 @@ Author: Felix Gabriel Girola
 
 from google.oauth2.credentials import Credentials
 from google_auth_oauthlib.flow import Flow
-from googleapiclient.discovery import build
-from googleapiclient.http import MediaIoBaseDownload
+from googleapiclient import discovery_cache
+from googleapiclient.discovery import build, build_from_document
+from googleapiclient.http import MediaIoBaseDownload, build_http
+from google_auth_httplib2 import AuthorizedHttp
+from cachetools import TTLCache
 from datetime import datetime, timedelta
-import io
+import threading
 
 # OAuth scopes - we only request read access to Drive
 # This follows the principle of least privilege
@@ -27,6 +30,54 @@ SCOPES = [
     'https://www.googleapis.com/auth/drive.metadata.readonly'
 ]
 
+# Google allows at most 100 calls in a single batch request
+BATCH_LIMIT = 100
+
+# Mapping of Google Workspace MIME types to export formats
+# These files don't have a "native" format (or an md5Checksum) - they must
+# be exported
+EXPORT_MIME_TYPES = {
+    'application/vnd.google-apps.document': 'application/pdf',
+    'application/vnd.google-apps.spreadsheet': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+    'application/vnd.google-apps.presentation': 'application/pdf',
+    'application/vnd.google-apps.drawing': 'application/pdf',
+}
+
+# Partial-response field sets for file listings. The minimal set drops
+# iconLink/thumbnailLink for UIs that render their own placeholders.
+LIST_FIELDS = "nextPageToken, files(id, name, mimeType, size, modifiedTime, iconLink, thumbnailLink)"
+LIST_FIELDS_MINIMAL = "nextPageToken, files(id, name, mimeType, size, modifiedTime)"
+
+# The Drive v3 discovery document bundled with google-api-python-client.
+# Loaded once per process instead of on every build() call.
+_DRIVE_DISCOVERY_DOC = discovery_cache.get_static_doc('drive', 'v3')
+
+# Built Drive services, keyed by (access token, thread). Services wrap an
+# httplib2 connection, which isn't thread-safe, so each thread gets its own.
+# Entries expire before the ~1 hour token lifetime runs out.
+_service_cache = TTLCache(maxsize=256, ttl=3000)
+_service_cache_lock = threading.Lock()
+
+# Recent Drive listings, so repeat UI polls (e.g. re-typing the same search)
+# don't go back to Drive. Keyed by access token so accounts never share
+# results.
+_list_cache = TTLCache(maxsize=1024, ttl=15)
+_list_cache_lock = threading.Lock()
+
+# One keep-alive httplib2 connection pool per thread, shared by every
+# service that thread builds, so TLS sessions to googleapis.com survive
+# token refreshes instead of being re-established per service
+_thread_http = threading.local()
+
+
+def _get_thread_http():
+    """Return this thread's persistent httplib2.Http, creating it on first use."""
+    http = getattr(_thread_http, 'http', None)
+    if http is None:
+        # build_http applies the client library's default timeout and redirects
+        http = _thread_http.http = build_http()
+    return http
+
 
 def create_oauth_flow(client_id, client_secret, redirect_uri):
     """
@@ -88,16 +139,35 @@ def get_drive_service(credentials):
     """
     Get a Google Drive API service client.
     
+    Services are cached per access token and thread, so repeat requests
+    skip parsing the discovery document and building the resource tree.
+    A refreshed token gets a fresh service.
+    
     Args:
         credentials: Valid Google OAuth credentials
         
     Returns:
         A googleapiclient.discovery.Resource for Drive API v3
     """
-    return build('drive', 'v3', credentials=credentials)
+    key = (credentials.token, threading.get_ident())
+    with _service_cache_lock:
+        service = _service_cache.get(key)
+    if service is not None:
+        return service
+    
+    # JSON responses are already gzip-negotiated by the client library
+    authed_http = AuthorizedHttp(credentials, http=_get_thread_http())
+    if _DRIVE_DISCOVERY_DOC:
+        service = build_from_document(_DRIVE_DISCOVERY_DOC, http=authed_http)
+    else:
+        service = build('drive', 'v3', http=authed_http, cache_discovery=False)
+    
+    with _service_cache_lock:
+        _service_cache[key] = service
+    return service
 
 
-def list_drive_files(service, page_token=None, query=None):
+def list_drive_files(service, page_token=None, query=None, minimal_fields=False):
     """
     List files from the user's Google Drive.
     
@@ -108,21 +178,21 @@ def list_drive_files(service, page_token=None, query=None):
         service: Google Drive API service
         page_token: Token for fetching the next page of results
         query: Optional search string to filter by filename
+        minimal_fields: Skip icon/thumbnail links to shrink the response
         
     Returns:
         Dictionary with 'files' list and optional 'nextPageToken'
     """
     # Build the query - always exclude trashed files
-    q = "trashed=false"
+    q_parts = ["trashed=false"]
     if query:
-        # Add name search - escape single quotes in the query
-        safe_query = query.replace("'", "\\'")
-        q += f" and name contains '{safe_query}'"
+        q_parts.append(f"name contains '{escape_drive_query(query)}'")
+    q = " and ".join(q_parts)
     
     # Request file metadata we need for the UI
     results = service.files().list(
         pageSize=50,  # Reasonable page size for UI
-        fields="nextPageToken, files(id, name, mimeType, size, modifiedTime, iconLink, thumbnailLink)",
+        fields=LIST_FIELDS_MINIMAL if minimal_fields else LIST_FIELDS,
         pageToken=page_token,
         q=q,
         orderBy="modifiedTime desc"
@@ -131,9 +201,85 @@ def list_drive_files(service, page_token=None, query=None):
     return results
 
 
-def download_file(service, file_id, file_name, mime_type):
+def get_file_checksum(service, file_id):
     """
-    Download a file from Google Drive.
+    Get the MD5 checksum Drive has recorded for a file's content.
+    
+    Args:
+        service: Google Drive API service
+        file_id: ID of the file
+        
+    Returns:
+        The hex md5Checksum, or None for Google Workspace files (Docs,
+        Sheets, ...) which have no binary content to hash
+    """
+    return service.files().get(fileId=file_id, fields='md5Checksum').execute().get('md5Checksum')
+
+
+def batch_get_metadata(service, file_ids,
+                       fields='id, name, mimeType, size, md5Checksum'):
+    """
+    Fetch metadata for many Drive files with as few HTTP requests as possible.
+    
+    Uses the Drive batch endpoint to pack up to BATCH_LIMIT files.get calls
+    into each request. Batching only works for metadata - file content
+    still has to be downloaded one file at a time.
+    
+    Args:
+        service: Google Drive API service
+        file_ids: Iterable of Google Drive file IDs
+        fields: Partial response fields to request for each file
+        
+    Returns:
+        Dictionary mapping file ID to its metadata. Files that couldn't be
+        fetched (deleted, no access) are left out.
+    """
+    results = {}
+    
+    def _collect(request_id, response, exception):
+        if exception is None:
+            results[request_id] = response
+    
+    # request_id must be unique within a batch, so drop duplicates
+    unique_ids = list(dict.fromkeys(file_ids))
+    for start in range(0, len(unique_ids), BATCH_LIMIT):
+        batch = service.new_batch_http_request(callback=_collect)
+        for file_id in unique_ids[start:start + BATCH_LIMIT]:
+            batch.add(service.files().get(fileId=file_id, fields=fields), request_id=file_id)
+        batch.execute()
+    
+    return results
+
+
+def list_drive_files_cached(credentials, page_token=None, query=None, minimal_fields=False):
+    """
+    Like list_drive_files, but serves repeats from a 15 second cache.
+    
+    Takes credentials rather than a service so the Drive service (which
+    is per-thread) is only built on a cache miss.
+    
+    Returns:
+        Dictionary with 'files' list and optional 'nextPageToken'
+    """
+    key = (credentials.token, query, page_token, minimal_fields)
+    with _list_cache_lock:
+        results = _list_cache.get(key)
+    if results is None:
+        service = get_drive_service(credentials)
+        results = list_drive_files(service, page_token, query, minimal_fields)
+        with _list_cache_lock:
+            _list_cache[key] = results
+    return results
+
+
+def escape_drive_query(value):
+    """Escape a string for use inside a single-quoted Drive query literal."""
+    return value.replace('\\', '\\\\').replace("'", "\\'")
+
+
+def download_file(service, file_id, file_name, mime_type, dest_fileobj):
+    """
+    Download a file from Google Drive into an open file object.
     
     Handles special cases for Google Workspace files (Docs, Sheets, Slides)
     which need to be exported to a standard format since they don't have
@@ -145,27 +291,22 @@ def download_file(service, file_id, file_name, mime_type):
     - Google Slides -> PDF
     - Google Drawings -> PDF
     
+    The content is streamed to dest_fileobj chunk by chunk, so memory use
+    stays at one chunk regardless of file size.
+    
     Args:
         service: Google Drive API service
         file_id: ID of the file to download
         file_name: Original filename
         mime_type: Original MIME type
+        dest_fileobj: Writable binary file object to stream the content into
         
     Returns:
-        Tuple of (file_buffer, final_filename, final_mime_type)
-    """
-    # Mapping of Google Workspace MIME types to export formats
-    # These files don't have a "native" format - they must be exported
-    export_mime_types = {
-        'application/vnd.google-apps.document': 'application/pdf',
-        'application/vnd.google-apps.spreadsheet': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
-        'application/vnd.google-apps.presentation': 'application/pdf',
-        'application/vnd.google-apps.drawing': 'application/pdf',
-    }
-    
-    if mime_type in export_mime_types:
+        Tuple of (final_filename, final_mime_type, bytes_downloaded)
+    """
+    if mime_type in EXPORT_MIME_TYPES:
         # Export Google Workspace file to a standard format
-        export_mime = export_mime_types[mime_type]
+        export_mime = EXPORT_MIME_TYPES[mime_type]
         request = service.files().export_media(
             fileId=file_id,
             mimeType=export_mime
@@ -184,15 +325,16 @@ def download_file(service, file_id, file_name, mime_type):
         # Regular file - download directly
         request = service.files().get_media(fileId=file_id)
     
-    # Download the file content to memory
-    file_buffer = io.BytesIO()
-    downloader = MediaIoBaseDownload(file_buffer, request)
+    # Stream the file content straight into the destination file
+    downloader = MediaIoBaseDownload(dest_fileobj, request, chunksize=1024 * 1024)
     
     done = False
+    status = None
     while not done:
         status, done = downloader.next_chunk()
         # Could add progress tracking here for large files
     
-    # Reset buffer position for reading
-    file_buffer.seek(0)
-    return file_buffer, file_name, mime_type
+    # The downloader tracks how many bytes it has written, so the size is
+    # known without stat-ing the file afterwards
+    bytes_downloaded = status.resumable_progress if status else 0
+    return file_name, mime_type, bytes_downloaded
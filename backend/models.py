@@ -12,6 +12,7 @@ Author: Felix Gabriel Girola
 """
 
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import DDL, event
 from datetime import datetime
 
 # Initialize SQLAlchemy - this is imported by app.py
@@ -59,7 +60,8 @@ class File(db.Model):
     serve files without hitting the Google Drive API.
     
     The google_drive_id is marked unique to prevent duplicate imports
-    of the same file.
+    of the same file. created_at is indexed because listings sort on it;
+    name search uses the trigram indexes set up below and in app.py.
     
     Attributes:
         id: Primary key (used in API URLs)
@@ -68,6 +70,8 @@ class File(db.Model):
         size: File size in bytes
         google_drive_id: The original Google Drive file ID (unique)
         local_path: Path to the file on the server's filesystem
+        md5: Drive's md5Checksum of the content (binary files only), used to
+             share one stored copy between imports of identical content
         created_at: When this file was imported
     """
     __tablename__ = 'files'
@@ -76,9 +80,10 @@ class File(db.Model):
     name = db.Column(db.String(500), nullable=False)
     mime_type = db.Column(db.String(255))
     size = db.Column(db.BigInteger)  # BigInteger for large files
-    google_drive_id = db.Column(db.String(255), unique=True)
+    google_drive_id = db.Column(db.String(255), unique=True, index=True)
     local_path = db.Column(db.String(1000), nullable=False)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    md5 = db.Column(db.String(32), index=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
     
     def to_dict(self):
         """
@@ -97,3 +102,16 @@ class File(db.Model):
     
     def __repr__(self):
         return f'<File {self.name}>'
+
+
+# On Postgres, a trigram index lets substring search (ILIKE '%foo%') use an
+# index instead of scanning every row. SQLite gets an FTS5 table instead,
+# set up in app.py
+event.listen(
+    File.__table__, 'before_create',
+    DDL('CREATE EXTENSION IF NOT EXISTS pg_trgm').execute_if(dialect='postgresql')
+)
+db.Index(
+    'ix_files_name_trgm', File.name,
+    postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'}
+).ddl_if(dialect='postgresql')
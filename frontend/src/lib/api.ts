@@ -100,7 +100,8 @@ export const api = {
    * @param query - Search string to filter files by name
    */
   async listDriveFiles(pageToken?: string, query?: string): Promise<DriveListResponse> {
-    const params = new URLSearchParams()
+    // The picker doesn't render Drive icons/thumbnails, so skip those fields
+    const params = new URLSearchParams({ minimal_fields: '1' })
     if (pageToken) params.set('pageToken', pageToken)
     if (query) params.set('query', query)
     